@@ -0,0 +1,219 @@
+"""
+新興國小失物招領系統：唯讀 JSON API
+
+供學校網站、LINE bot 等輪詢使用，不經過 Streamlit session。
+啟動方式：python lost_found_api.py（連接埠由 API_PORT 或 PORT 指定，預設 8502）
+
+GET /api/items?status=未領取&q=水壺&start=2025-12-01&end=2025-12-31&page=1&per_page=20
+GET /thumbs/<檔名>.jpg
+
+ETag 由資料檔版本（本機為修改時間與大小，S3 為物件 ETag）組成，資料未變動時直接回 304，不讀取 CSV。
+"""
+import json
+import logging
+import os
+import threading
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from lost_found_data import (
+    IMG_PREFIX,
+    storage,
+    load_config,
+    load_data,
+    data_version,
+    filter_items,
+    get_days_left,
+    ensure_thumbnail,
+    image_key,
+)
+
+logger = logging.getLogger(__name__)
+
+API_PORT = int(os.environ.get("API_PORT", os.environ.get("PORT", "8502")))
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+# 依資料版本快取已解析的資料，避免每次請求都重新讀 CSV
+_cache_lock = threading.Lock()
+_cache = {"version": None, "df": None, "expiry_days": 60}
+
+
+def get_cached_data(version):
+    with _cache_lock:
+        if _cache["version"] != version:
+            _cache["df"] = load_data()
+            _cache["expiry_days"] = int(load_config().get("expiry_days", 60))
+            _cache["version"] = version
+        return _cache["df"], _cache["expiry_days"]
+
+
+def parse_date(value):
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def parse_positive_int(name, value, default):
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise ValueError(f"{name} 必須是正整數")
+    return number
+
+
+def build_item_list(df, expiry_days, params):
+    """依查詢參數篩選、分頁並轉成 JSON 結構"""
+    status = params.get("status", "全部")
+    if status not in ("全部", "未領取", "已領回"):
+        raise ValueError(f"不支援的狀態：{status}")
+
+    try:
+        start_date = parse_date(params.get("start"))
+        end_date = parse_date(params.get("end"))
+    except ValueError:
+        raise ValueError("日期格式須為 YYYY-MM-DD")
+
+    page = parse_positive_int("page", params.get("page"), 1)
+    per_page = min(parse_positive_int("per_page", params.get("per_page"), DEFAULT_PER_PAGE), MAX_PER_PAGE)
+
+    filtered = filter_items(
+        df,
+        status=status,
+        keyword=params.get("q", ""),
+        start_date=start_date,
+        end_date=end_date
+    ).sort_values(by="ID", ascending=False)
+
+    total = len(filtered)
+    page_df = filtered.iloc[(page - 1) * per_page: page * per_page]
+
+    items = []
+    for _, row in page_df.iterrows():
+        key = image_key(row["圖片路徑"])
+        _, deadline = get_days_left(row["拾獲日期"], expiry_days)
+
+        items.append({
+            "id": int(row["ID"]),
+            "name": str(row["物品名稱"]),
+            "location": str(row["拾獲地點"]),
+            "found_date": str(row["拾獲日期"]),
+            "deadline": str(deadline),
+            "description": str(row["特徵描述"]),
+            "status": str(row["狀態"]),
+            "thumb_url": f"/thumbs/{os.path.basename(key)}" if key else ""
+        })
+
+    return {
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "items": items
+    }
+
+
+class LostFoundAPIHandler(BaseHTTPRequestHandler):
+    server_version = "LostFoundAPI/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+
+        if url.path == "/api/items":
+            self.handle_items(url.query)
+        elif url.path.startswith("/thumbs/"):
+            self.handle_thumb(unquote(url.path[len("/thumbs/"):]))
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def handle_items(self, query):
+        version = data_version()
+        etag = f'"{version}-{zlib.crc32(query.encode("utf-8")):08x}"'
+
+        if self.etag_matches(etag):
+            self.send_not_modified(etag)
+            return
+
+        params = {key: values[0] for key, values in parse_qs(query).items()}
+        df, expiry_days = get_cached_data(version)
+
+        try:
+            payload = build_item_list(df, expiry_days, params)
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        self.send_json(200, payload, headers={
+            "ETag": etag,
+            "Cache-Control": "no-cache"
+        })
+
+    def handle_thumb(self, name):
+        if not name or name != os.path.basename(name) or not name.lower().endswith(".jpg"):
+            self.send_json(404, {"error": "not found"})
+            return
+
+        thumb_key = ensure_thumbnail(IMG_PREFIX + name)
+        if thumb_key is None:
+            self.send_json(404, {"error": "not found"})
+            return
+
+        etag = f'"{storage.version(thumb_key)}"'
+
+        if self.etag_matches(etag):
+            self.send_not_modified(etag)
+            return
+
+        try:
+            body = storage.read_bytes(thumb_key)
+        except FileNotFoundError:
+            self.send_json(404, {"error": "not found"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "public, max-age=86400")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def etag_matches(self, etag):
+        if_none_match = self.headers.get("If-None-Match", "")
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return etag in candidates or "*" in candidates
+
+    def send_not_modified(self, etag):
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+
+    def send_json(self, code, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    server = ThreadingHTTPServer(("0.0.0.0", API_PORT), LostFoundAPIHandler)
+    logger.info("失物招領 API 啟動於 port %s", API_PORT)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
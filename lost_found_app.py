@@ -1,13 +1,33 @@
-from PIL import Image, ImageOps
 import streamlit as st
 import pandas as pd
 import os
-import json
-import zipfile
 import io
-import shutil
 from datetime import datetime, timedelta
 
+from lost_found_data import (
+    SNAPSHOT_PREFIX,
+    storage,
+    load_config,
+    save_config,
+    load_data,
+    add_item,
+    delete_item,
+    update_status,
+    get_days_left,
+    get_image_path,
+    save_image_bytes,
+    filter_items,
+    create_backup_zip,
+    data_version,
+    restore_data_from_zip,
+    export_static_snapshot,
+    get_snapshot_error,
+    load_stats,
+    verify_and_rebuild_stats,
+)
+from lost_found_stats import claim_rate, median_claim_days
+from lost_found_images import open_image_bounded
+
 # --- 1. 頁面基本設定 ---
 st.set_page_config(
     page_title="新興國小失物招領系統",
@@ -15,21 +35,9 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- 2. 路徑設定（支援 Railway Volume） ---
-BASE_DATA_DIR = os.environ.get("DATA_DIR", ".")
-DATA_FILE = os.path.join(BASE_DATA_DIR, "lost_items.csv")
-IMG_DIR = os.path.join(BASE_DATA_DIR, "uploaded_images")
-CONFIG_FILE = os.path.join(BASE_DATA_DIR, "config.json")
+# --- 2. 權限設定（路徑設定見 lost_found_data.py） ---
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "720720")
 
-DATA_COLUMNS = ["ID", "物品名稱", "拾獲地點", "拾獲日期", "特徵描述", "圖片路徑", "狀態"]
-
-os.makedirs(BASE_DATA_DIR, exist_ok=True)
-os.makedirs(IMG_DIR, exist_ok=True)
-
-if not os.path.exists(DATA_FILE):
-    pd.DataFrame(columns=DATA_COLUMNS).to_csv(DATA_FILE, index=False)
-
 # --- 3. 自訂 CSS 美化樣式 ---
 st.markdown("""
     <style>
@@ -112,154 +120,24 @@ st.markdown("""
 
 # --- 4. 輔助函數 ---
 def process_uploaded_image(uploaded_file):
-    """讀取上傳圖片，先做 EXIF 自動轉正，回傳 Pillow Image"""
+    """讀取上傳圖片（含大小限制），先做 EXIF 自動轉正，回傳 Pillow Image"""
     try:
-        img = Image.open(uploaded_file)
-        img = ImageOps.exif_transpose(img)
-
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGB")
-        elif img.mode != "RGB":
-            img = img.convert("RGB")
-
+        img = open_image_bounded(uploaded_file)
         return img, None
     except Exception as e:
         return None, str(e)
 
 
-def save_processed_image(img, save_path, max_size=(1600, 1600), quality=75):
-    """將使用者確認後的圖片壓縮儲存成 JPG"""
+def save_processed_image(img, img_filename, max_size=(1600, 1600), quality=75):
+    """將使用者確認後的圖片壓縮成 JPG 存入儲存後端，回傳圖片路徑"""
     try:
         img = img.copy()
         img.thumbnail(max_size)
-        img.save(save_path, format="JPEG", quality=quality, optimize=True)
-        return True, None
-    except Exception as e:
-        return False, str(e)
-
-
-def load_config():
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {"expiry_days": 60}
-    return {"expiry_days": 60}
-
-
-def save_config(config):
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
-
-
-def load_data():
-    if not os.path.exists(DATA_FILE):
-        return pd.DataFrame(columns=DATA_COLUMNS)
-
-    try:
-        df = pd.read_csv(DATA_FILE)
-        for col in DATA_COLUMNS:
-            if col not in df.columns:
-                df[col] = ""
-        return df[DATA_COLUMNS]
-    except Exception:
-        return pd.DataFrame(columns=DATA_COLUMNS)
-
-
-def save_data(df):
-    df.to_csv(DATA_FILE, index=False, encoding="utf-8-sig")
-
-
-def delete_item(item_id):
-    df = load_data()
-    target_row = df[df["ID"] == item_id]
-
-    if not target_row.empty:
-        img_path = str(target_row.iloc[0]["圖片路徑"])
-        if pd.notna(img_path) and img_path and os.path.exists(img_path):
-            try:
-                os.remove(img_path)
-            except Exception:
-                pass
-
-        df = df[df["ID"] != item_id]
-        save_data(df)
-
-
-def update_status(item_id):
-    df = load_data()
-    df.loc[df["ID"] == item_id, "狀態"] = "已領回"
-    save_data(df)
-
-
-def get_days_left(found_date_str, expiry_days):
-    try:
-        found_date = datetime.strptime(str(found_date_str), "%Y-%m-%d").date()
-        deadline = found_date + timedelta(days=expiry_days)
-        today = datetime.now().date()
-        days_left = (deadline - today).days
-        return days_left, deadline
-    except Exception:
-        return 0, datetime.now().date()
-
-
-def create_backup_zip():
-    """建立結構乾淨的備份 ZIP"""
-    buffer = io.BytesIO()
-
-    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        if os.path.exists(DATA_FILE):
-            zf.write(DATA_FILE, arcname="lost_items.csv")
-
-        if os.path.exists(CONFIG_FILE):
-            zf.write(CONFIG_FILE, arcname="config.json")
-
-        if os.path.exists(IMG_DIR):
-            for root, dirs, files in os.walk(IMG_DIR):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(file_path, BASE_DATA_DIR)
-                    zf.write(file_path, arcname=rel_path)
-
-    buffer.seek(0)
-    return buffer
-
-
-def restore_data_from_zip(uploaded_zip):
-    """將備份還原到 BASE_DATA_DIR"""
-    try:
-        with zipfile.ZipFile(uploaded_zip, "r") as zf:
-            file_names = zf.namelist()
-
-            if "lost_items.csv" not in file_names:
-                return False, "備份檔中找不到 lost_items.csv"
-
-            for member in file_names:
-                normalized = os.path.normpath(member)
-                if normalized.startswith("..") or os.path.isabs(normalized):
-                    return False, f"備份檔含不安全路徑：{member}"
-
-            os.makedirs(BASE_DATA_DIR, exist_ok=True)
-
-            if os.path.exists(DATA_FILE):
-                os.remove(DATA_FILE)
-            if os.path.exists(CONFIG_FILE):
-                os.remove(CONFIG_FILE)
-            if os.path.exists(IMG_DIR):
-                shutil.rmtree(IMG_DIR)
-
-            os.makedirs(IMG_DIR, exist_ok=True)
-            zf.extractall(BASE_DATA_DIR)
-
-            if not os.path.exists(CONFIG_FILE):
-                save_config({"expiry_days": 60})
-
-            os.makedirs(IMG_DIR, exist_ok=True)
-            return True, "還原成功！"
-
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="JPEG", quality=quality, optimize=True)
+        return save_image_bytes(img_filename, img_bytes.getvalue()), None
     except Exception as e:
-        return False, f"還原失敗：{str(e)}"
+        return None, str(e)
 
 
 def build_excel_report(export_df):
@@ -343,20 +221,11 @@ def build_excel_report(export_df):
             # 固定列高（避免重疊）
             worksheet.set_row(excel_row, 110)
 
-            if pd.notna(img_path) and str(img_path).strip() and os.path.exists(str(img_path)):
-                try:
-                    img = Image.open(str(img_path))
-                    img = ImageOps.exif_transpose(img)
+            local_img_path = get_image_path(img_path)
 
-                    if img.mode in ("RGBA", "P"):
-                        img = img.convert("RGB")
-                    elif img.mode != "RGB":
-                        img = img.convert("RGB")
-
-                    max_size = 120
-                    ratio = min(max_size / img.width, max_size / img.height)
-                    new_size = (int(img.width * ratio), int(img.height * ratio))
-                    img = img.resize(new_size)
+            if local_img_path:
+                try:
+                    img = open_image_bounded(local_img_path, max_size=(120, 120))
 
                     img_bytes = io.BytesIO()
                     img.save(img_bytes, format="JPEG", quality=80)
@@ -383,7 +252,69 @@ def build_excel_report(export_df):
     return excel_buffer
 
 
+def top_counts_df(counter, label, limit=10):
+    """將統計 dict 轉成依件數排序的表格"""
+    rows = [
+        {label: key, "件數": value["total"], "已領回": value["claimed"]}
+        for key, value in counter.items()
+    ]
+    if not rows:
+        return pd.DataFrame(columns=[label, "件數", "已領回"])
+    df = pd.DataFrame(rows).sort_values(by="件數", ascending=False)
+    return df.head(limit) if limit else df
+
+
+def verify_stats():
+    """從完整資料重新計算統計並與增量結果比對，結果存入 session_state 供下次重繪顯示"""
+    st.session_state.stats_verify_result = verify_and_rebuild_stats()
+
+
+def render_stats_dashboard():
+    """管理員統計儀表板（讀取增量維護的 stats.json，不掃描 CSV）"""
+    verify_result = st.session_state.pop("stats_verify_result", None)
+    if verify_result is True:
+        st.success("✅ 統計結果與完整資料一致")
+    elif verify_result is False:
+        st.warning("⚠️ 統計結果與完整資料不一致，已重新計算並更新")
+
+    stats = load_stats()
+
+    col_total, col_open, col_rate, col_median = st.columns(4)
+    col_total.metric("累計登記", stats["total"])
+    col_open.metric("尚未領回", stats["total"] - stats["claimed"])
+    col_rate.metric("領回率", f"{claim_rate(stats):.0%}")
+
+    median_days = median_claim_days(stats)
+    col_median.metric("領回天數中位數", "—" if median_days is None else f"{median_days:g} 天")
+
+    col_location, col_name = st.columns(2)
+
+    with col_location:
+        st.markdown("**📍 拾獲地點（前 10 名）**")
+        location_df = top_counts_df(stats["by_location"], "拾獲地點")
+        st.bar_chart(location_df, x="拾獲地點", y=["件數", "已領回"], stack=False)
+
+    with col_name:
+        st.markdown("**🏷️ 物品名稱（前 10 名）**")
+        name_df = top_counts_df(stats["by_name"], "物品名稱")
+        st.bar_chart(name_df, x="物品名稱", y=["件數", "已領回"], stack=False)
+
+    st.markdown("**📅 每週拾獲件數**")
+    week_df = top_counts_df(stats["by_week"], "週別", limit=None).sort_values(by="週別")
+    st.bar_chart(week_df, x="週別", y=["件數", "已領回"], stack=False)
+
+    st.button("🔄 從完整資料重新計算統計", key="rebuild_stats", on_click=verify_stats)
+
+
 # --- 5. 主程式 ---
+@st.cache_resource
+def ensure_snapshot():
+    """第一次部署時還沒有靜態快照，補產生一次；每個程序只檢查一次，不隨每次 rerun 查詢儲存空間"""
+    if not storage.exists(SNAPSHOT_PREFIX + "items.json"):
+        export_static_snapshot()
+    return True
+
+
 def main():
     if "preview_rotation" not in st.session_state:
         st.session_state.preview_rotation = 0
@@ -391,6 +322,8 @@ def main():
     config = load_config()
     current_expiry_days = config.get("expiry_days", 60)
 
+    ensure_snapshot()
+
     st.markdown(f"""
         <div class="header-container">
             <p class="main-title">🏫 台南市南區新興國小失物招領系統</p>
@@ -467,41 +400,24 @@ def main():
 
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
                     img_filename = f"{timestamp}.jpg"
-                    img_path = os.path.join(IMG_DIR, img_filename)
-
-                    success, save_error = save_processed_image(final_img, img_path)
+                    img_path, save_error = save_processed_image(final_img, img_filename)
 
-                    if not success:
+                    if img_path is None:
                         st.error(f"圖片儲存失敗：{save_error}")
                         st.stop()
 
                     final_location = location if location else "未提供"
                     final_desc = desc if desc else "無特殊描述"
 
-                    df = load_data()
-
-                    if not df.empty and pd.api.types.is_numeric_dtype(df["ID"]):
-                        new_id = int(df["ID"].max()) + 1
-                    elif not df.empty:
-                        try:
-                            new_id = int(pd.to_numeric(df["ID"], errors="coerce").max()) + 1
-                        except Exception:
-                            new_id = 1
-                    else:
-                        new_id = 1
-
-                    new_data = {
-                        "ID": new_id,
+                    add_item({
                         "物品名稱": name,
                         "拾獲地點": final_location,
                         "拾獲日期": str(date),
                         "特徵描述": final_desc,
                         "圖片路徑": img_path,
-                        "狀態": "未領取"
-                    }
-
-                    df = pd.concat([df, pd.DataFrame([new_data])], ignore_index=True)
-                    save_data(df)
+                        "狀態": "未領取",
+                        "領回日期": ""
+                    })
 
                     st.session_state.preview_rotation = 0
                     st.success("✅ 發布成功！")
@@ -514,6 +430,10 @@ def main():
             st.divider()
             st.subheader("⚙️ 系統設定與維護")
 
+            snapshot_error = get_snapshot_error()
+            if snapshot_error:
+                st.warning(f"⚠️ 靜態快照更新失敗，公開頁面可能不是最新資料：{snapshot_error}")
+
             st.markdown("**認領期限設定**")
             new_expiry = st.number_input(
                 "天數",
@@ -524,6 +444,7 @@ def main():
             if new_expiry != current_expiry_days:
                 config["expiry_days"] = int(new_expiry)
                 save_config(config)
+                export_static_snapshot()
                 st.rerun()
 
             st.write("---")
@@ -531,16 +452,30 @@ def main():
             st.markdown("**💾 資料備份 (下載 ZIP)**")
             st.caption("下載包含 CSV 與所有圖片的備份檔")
 
-            zip_buffer = create_backup_zip()
-            timestamp_str = datetime.now().strftime("%Y%m%d")
+            # 備份需讀取所有圖片（S3 後端會逐一下載），只在按下按鈕時建立；資料變動後需重新產生
+            backup = st.session_state.get("backup_zip")
+            if backup is not None and backup["version"] != data_version():
+                backup = None
+                st.session_state.pop("backup_zip", None)
+
+            if st.button("📦 產生備份檔", use_container_width=True):
+                with st.spinner("正在打包資料與圖片..."):
+                    backup = {
+                        "version": data_version(),
+                        "data": create_backup_zip().getvalue()
+                    }
+                st.session_state.backup_zip = backup
+
+            if backup is not None:
+                timestamp_str = datetime.now().strftime("%Y%m%d")
 
-            st.download_button(
-                label="⬇️ 下載完整系統備份",
-                data=zip_buffer,
-                file_name=f"lost_found_backup_{timestamp_str}.zip",
-                mime="application/zip",
-                use_container_width=True
-            )
+                st.download_button(
+                    label="⬇️ 下載完整系統備份",
+                    data=backup["data"],
+                    file_name=f"lost_found_backup_{timestamp_str}.zip",
+                    mime="application/zip",
+                    use_container_width=True
+                )
 
             st.write("---")
 
@@ -640,7 +575,10 @@ def main():
 
 
     # --- 主畫面顯示 ---
-        # --- 主畫面顯示 ---
+    if is_admin:
+        with st.expander("📊 統計儀表板"):
+            render_stats_dashboard()
+
     st.markdown('<div class="toolbar-box">', unsafe_allow_html=True)
     st.markdown('<div class="toolbar-title">🔎 快速查找失物</div>', unsafe_allow_html=True)
 
@@ -660,15 +598,8 @@ def main():
     if df.empty:
         st.info("目前沒有失物資料。")
     else:
-        # 狀態篩選
-        if filter_status == "未領取":
-            df = df[df["狀態"] == "未領取"]
-        elif filter_status == "已領回":
-            df = df[df["狀態"] == "已領回"]
-
-        # 關鍵字搜尋（只搜尋物品名稱）
-        if keyword.strip():
-            df = df[df["物品名稱"].astype(str).str.contains(keyword.strip(), case=False, na=False)]
+        # 狀態篩選與關鍵字搜尋（只搜尋物品名稱）
+        df = filter_items(df, status=filter_status, keyword=keyword)
 
         # 排序
         df = df.sort_values(by="ID", ascending=False)
@@ -684,8 +615,8 @@ def main():
                     days_left, deadline_date = get_days_left(row["拾獲日期"], current_expiry_days)
 
                     with col1:
-                        img_path = str(row["圖片路徑"]) if pd.notna(row["圖片路徑"]) else ""
-                        if img_path and os.path.exists(img_path):
+                        img_path = get_image_path(row["圖片路徑"])
+                        if img_path:
                             st.image(img_path, use_container_width=True)
                         else:
                             st.warning("圖片遺失")
@@ -0,0 +1,577 @@
+"""
+失物資料層：CSV / 設定檔讀寫、備份還原與靜態快照。
+不依賴 Streamlit，供 lost_found_app.py 與 lost_found_api.py 共用。
+所有檔案都透過 lost_found_storage 的儲存後端存取，可放在本機目錄或 S3 相容的物件儲存。
+"""
+import pandas as pd
+import os
+import json
+import zipfile
+import io
+import html
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from lost_found_storage import get_storage
+from lost_found_stats import apply_item, rebuild_stats
+from lost_found_images import open_image_bounded
+
+logger = logging.getLogger(__name__)
+
+# --- 儲存設定（支援 Railway Volume 與 S3 相容物件儲存） ---
+storage = get_storage()
+
+DATA_KEY = "lost_items.csv"
+CONFIG_KEY = "config.json"
+STATS_KEY = "stats.json"
+# 條件式寫入衝突時的重試次數
+WRITE_RETRIES = 10
+IMG_PREFIX = "uploaded_images/"
+# 靜態快照：唯讀的失物清單（HTML + JSON + 縮圖），可交給任何靜態檔案伺服器或物件儲存的靜態網站功能
+SNAPSHOT_PREFIX = "snapshot/"
+SNAPSHOT_THUMB_PREFIX = SNAPSHOT_PREFIX + "thumbs/"
+
+# 同一程序內的資料異動依序進行：CSV 寫入與對應的統計增量之間不會插入其他異動或重新計算
+_mutation_lock = threading.RLock()
+
+# 最近一次靜態快照輸出的錯誤訊息（成功時為 None），供管理員介面顯示
+_snapshot_state = {"error": None}
+
+DATA_COLUMNS = ["ID", "物品名稱", "拾獲地點", "拾獲日期", "特徵描述", "圖片路徑", "狀態", "領回日期"]
+
+# 僅在不存在時建立；多個副本同時啟動時只有一個會寫入成功，其餘回傳 None 直接略過
+storage.write_if_match(DATA_KEY, pd.DataFrame(columns=DATA_COLUMNS).to_csv(index=False).encode("utf-8"), None)
+
+
+# --- 資料存取 ---
+def image_key(img_path):
+    """
+    將 CSV 中的圖片路徑轉成儲存 key。
+    舊資料可能存的是 uploaded_images/xxx.jpg 或 /data/uploaded_images/xxx.jpg，一律以檔名為準。
+    """
+    if pd.isna(img_path) or not str(img_path).strip():
+        return ""
+    return IMG_PREFIX + os.path.basename(str(img_path).replace("\\", "/"))
+
+
+def get_image_path(img_path):
+    """回傳可直接開啟的本機圖片路徑（S3 後端會經由本機快取）；找不到時回傳 None"""
+    key = image_key(img_path)
+    if not key:
+        return None
+    try:
+        return storage.local_path(key)
+    except Exception:
+        return None
+
+
+def save_image_bytes(img_filename, data):
+    """儲存上傳圖片，回傳要寫入 CSV 的圖片路徑"""
+    key = IMG_PREFIX + img_filename
+    storage.write_bytes(key, data)
+    return key
+
+
+def load_config():
+    try:
+        return json.loads(storage.read_text(CONFIG_KEY))
+    except Exception:
+        return {"expiry_days": 60}
+
+
+def save_config(config):
+    storage.write_text(CONFIG_KEY, json.dumps(config, ensure_ascii=False, indent=2))
+
+
+def load_data():
+    try:
+        data = storage.read_bytes(DATA_KEY)
+    except FileNotFoundError:
+        return pd.DataFrame(columns=DATA_COLUMNS)
+
+    return _parse_data(data)
+
+
+def _parse_data(data):
+    if data is None:
+        return pd.DataFrame(columns=DATA_COLUMNS)
+
+    try:
+        df = pd.read_csv(io.BytesIO(data))
+        for col in DATA_COLUMNS:
+            if col not in df.columns:
+                df[col] = ""
+        df["領回日期"] = df["領回日期"].fillna("").astype(str)
+        return df[DATA_COLUMNS]
+    except Exception:
+        return pd.DataFrame(columns=DATA_COLUMNS)
+
+
+def _encode_data(df):
+    return df.to_csv(index=False).encode("utf-8-sig")
+
+
+def save_data(df, token):
+    """
+    以條件式寫入儲存 CSV（token 為讀取時的版本標記），成功後更新靜態快照。
+    內容已被其他寫入者修改時不寫入，回傳 False。
+    """
+    new_token = storage.write_if_match(DATA_KEY, _encode_data(df), token)
+    if not new_token:
+        return False
+
+    _export_latest_snapshot(df, new_token)
+    return True
+
+
+def _export_latest_snapshot(df, token):
+    """
+    輸出 df（版本為 token）的快照後確認 CSV 沒有再被改過。
+    其他副本若在這段期間寫入，剛輸出的舊快照可能蓋掉它較新的快照、刪掉它剛產生的縮圖，
+    因此改以最新內容重新輸出，直到輸出時的版本即為目前版本。
+    """
+    for _ in range(WRITE_RETRIES):
+        export_static_snapshot(df)
+        data, current = storage.read_versioned(DATA_KEY)
+        if current is None or current == token:
+            return
+        df, token = _parse_data(data), current
+
+
+def _backoff(attempt):
+    """條件式寫入衝突後稍等再試，加上隨機延遲避免多個寫入者同步重撞"""
+    time.sleep(random.uniform(0, min(0.05 * 2 ** attempt, 1.0)))
+
+
+def modify_data(mutate):
+    """
+    以條件式寫入修改 CSV：讀取目前內容與版本，交給 mutate(df) 修改後，
+    僅在這段期間沒有其他人（其他 session 或其他副本）寫入時才寫回，否則重新讀取再試。
+    mutate 回傳 None 表示不需修改；否則回傳 (新的 df, 結果)，本函數回傳該結果。
+    """
+    for attempt in range(WRITE_RETRIES):
+        if attempt:
+            _backoff(attempt)
+
+        data, token = storage.read_versioned(DATA_KEY)
+        change = mutate(_parse_data(data))
+        if change is None:
+            return None
+
+        new_df, result = change
+        if save_data(new_df, token):
+            return result
+
+    raise RuntimeError("資料同時被多人修改，請稍後再試")
+
+
+def make_thumbnail(src_path, max_size=(400, 400), quality=70):
+    """產生縮圖 JPG，回傳檔案內容"""
+    img = open_image_bounded(src_path, max_size=max_size)
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def ensure_thumbnail(img_path, existing_thumbs=None):
+    """
+    確保快照中有該圖片的縮圖，回傳縮圖 key；原圖不存在或無法處理時回傳 None。
+    上傳圖片的檔名含時間戳記、內容不會變動，縮圖已存在就不重新產生。
+    existing_thumbs 為已列出的縮圖 key 集合，傳入時就不必逐一查詢儲存後端。
+    """
+    key = image_key(img_path)
+    if not key:
+        return None
+
+    thumb_key = SNAPSHOT_THUMB_PREFIX + os.path.basename(key)
+
+    try:
+        if existing_thumbs is not None:
+            exists = thumb_key in existing_thumbs
+        else:
+            exists = storage.exists(thumb_key)
+
+        if not exists:
+            src_path = storage.local_path(key)
+            if src_path is None:
+                return None
+            storage.write_bytes(thumb_key, make_thumbnail(src_path))
+        return thumb_key
+    except Exception:
+        return None
+
+
+def build_snapshot_html(items, expiry_days, generated_at):
+    """將未領取清單轉成獨立的靜態 HTML 頁面"""
+    cards = []
+    for item in items:
+        if item["thumb"]:
+            img_tag = f'<img src="{html.escape(item["thumb"])}" alt="{html.escape(item["name"])}" loading="lazy">'
+        else:
+            img_tag = '<div class="no-img">圖片遺失</div>'
+
+        cards.append(f"""
+        <div class="card">
+            {img_tag}
+            <h3>{html.escape(item["name"])}</h3>
+            <p>📍 地點：{html.escape(item["location"])}</p>
+            <p>📅 拾獲日：{html.escape(item["found_date"])}</p>
+            <p>🛑 截止日：{html.escape(item["deadline"])}</p>
+            <p>📝 描述：{html.escape(item["description"])}</p>
+        </div>""")
+
+    body = "".join(cards) if cards else '<p class="empty">目前沒有待認領的失物。</p>'
+
+    return f"""<!DOCTYPE html>
+<html lang="zh-Hant">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<meta http-equiv="refresh" content="300">
+<title>新興國小失物招領清單</title>
+<style>
+    body {{ font-family: "Microsoft JhengHei", sans-serif; background: #F8FAFC; margin: 0; padding: 20px; }}
+    .header {{ background: #1E3A8A; color: #FFFFFF; padding: 24px; border-radius: 15px; text-align: center; margin-bottom: 20px; }}
+    .header h1 {{ margin: 0; font-size: 2.2rem; }}
+    .header p {{ margin: 8px 0 0 0; color: #E0E7FF; }}
+    .grid {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(240px, 1fr)); gap: 16px; }}
+    .card {{ background: #FFFFFF; border: 1px solid #D6E4FF; border-radius: 14px; padding: 12px; }}
+    .card img {{ width: 100%; border-radius: 10px; }}
+    .card h3 {{ margin: 10px 0 6px 0; color: #1E3A8A; }}
+    .card p {{ margin: 4px 0; font-size: 0.95rem; }}
+    .no-img {{ background: #FEF3C7; padding: 40px 0; text-align: center; border-radius: 10px; }}
+    .empty {{ text-align: center; color: #6B7280; }}
+    .footer {{ text-align: center; color: #6B7280; font-size: 0.85rem; margin-top: 20px; }}
+</style>
+</head>
+<body>
+<div class="header">
+    <h1>🏫 台南市南區新興國小失物招領系統</h1>
+    <p>物品認領期限：{expiry_days} 天｜欲認領請洽學務處</p>
+</div>
+<div class="grid">{body}
+</div>
+<p class="footer">更新時間：{generated_at}</p>
+</body>
+</html>
+"""
+
+
+def export_static_snapshot(df=None):
+    """
+    將目前未領取的失物輸出成靜態快照（snapshot/ 下的 index.html、items.json、thumbs/）。
+    縮圖只在新增或原圖更新時才重新產生，已刪除物品的縮圖會被移除。
+    """
+    try:
+        if df is None:
+            df = load_data()
+
+        config = load_config()
+        expiry_days = int(config.get("expiry_days", 60))
+
+        open_df = df[df["狀態"] == "未領取"].sort_values(by="ID", ascending=False)
+
+        # 一次列出既有縮圖，避免每件物品各發一次查詢（S3 為 HEAD 請求）
+        existing_thumbs = set(storage.list_keys(SNAPSHOT_THUMB_PREFIX))
+
+        items = []
+
+        for _, row in open_df.iterrows():
+            img_path = str(row["圖片路徑"]) if pd.notna(row["圖片路徑"]) else ""
+            thumb_key = ensure_thumbnail(img_path, existing_thumbs)
+
+            _, deadline = get_days_left(row["拾獲日期"], expiry_days)
+
+            items.append({
+                "id": int(row["ID"]),
+                "name": str(row["物品名稱"]),
+                "location": str(row["拾獲地點"]),
+                "found_date": str(row["拾獲日期"]),
+                "deadline": str(deadline),
+                "description": str(row["特徵描述"]),
+                "thumb": thumb_key[len(SNAPSHOT_PREFIX):] if thumb_key else ""
+            })
+
+        # 已領回物品的縮圖保留給 API 使用，只移除已刪除物品的縮圖
+        known_thumbs = {
+            SNAPSHOT_THUMB_PREFIX + os.path.basename(image_key(path))
+            for path in df["圖片路徑"]
+            if image_key(path)
+        }
+        for thumb_key in existing_thumbs - known_thumbs:
+            try:
+                storage.delete(thumb_key)
+            except Exception:
+                pass
+
+        generated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        snapshot = {
+            "generated_at": generated_at,
+            "expiry_days": expiry_days,
+            "items": items
+        }
+
+        storage.write_text(
+            SNAPSHOT_PREFIX + "items.json",
+            json.dumps(snapshot, ensure_ascii=False, indent=2)
+        )
+        storage.write_text(
+            SNAPSHOT_PREFIX + "index.html",
+            build_snapshot_html(items, expiry_days, generated_at)
+        )
+        _snapshot_state["error"] = None
+        return True, None
+    except Exception as e:
+        logger.warning("靜態快照輸出失敗：%s", e, exc_info=True)
+        _snapshot_state["error"] = str(e)
+        return False, str(e)
+
+
+def get_snapshot_error():
+    """回傳最近一次靜態快照輸出的錯誤訊息；成功時回傳 None"""
+    return _snapshot_state["error"]
+
+
+def delete_item(item_id):
+    def mutate(df):
+        target_row = df[df["ID"] == item_id]
+        if target_row.empty:
+            return None
+        return df[df["ID"] != item_id], target_row.to_dict("records")
+
+    # 只有真的由這次寫入刪掉的資料才更新統計與刪除圖片（兩人同時刪除時只算一次）
+    with _mutation_lock:
+        removed = modify_data(mutate)
+        if removed:
+            update_stats(removed=removed)
+
+    if not removed:
+        return
+
+    key = image_key(removed[0]["圖片路徑"])
+    if key:
+        try:
+            storage.delete(key)
+        except Exception:
+            pass
+
+
+def update_status(item_id):
+    def mutate(df):
+        target = (df["ID"] == item_id) & (df["狀態"] != "已領回")
+        if not target.any():
+            return None
+
+        df = df.copy()
+        before = df[target].to_dict("records")
+        df.loc[target, "狀態"] = "已領回"
+        df.loc[target, "領回日期"] = datetime.now().strftime("%Y-%m-%d")
+        after = df[target].to_dict("records")
+        return df, (before, after)
+
+    with _mutation_lock:
+        change = modify_data(mutate)
+        if change is not None:
+            before, after = change
+            update_stats(removed=before, added=after)
+
+
+def add_item(new_data):
+    """新增一筆失物，自動編號後回傳新 ID"""
+    def mutate(df):
+        if not df.empty and pd.api.types.is_numeric_dtype(df["ID"]):
+            new_id = int(df["ID"].max()) + 1
+        elif not df.empty:
+            try:
+                new_id = int(pd.to_numeric(df["ID"], errors="coerce").max()) + 1
+            except Exception:
+                new_id = 1
+        else:
+            new_id = 1
+
+        row = {"ID": new_id, **new_data}
+        return pd.concat([df, pd.DataFrame([row])], ignore_index=True), row
+
+    with _mutation_lock:
+        row = modify_data(mutate)
+        update_stats(added=[row])
+    return row["ID"]
+
+
+# --- 統計資料（增量更新） ---
+def load_stats():
+    """讀取統計；尚未建立或無法讀取時從 CSV 重算一次並存檔"""
+    try:
+        return json.loads(storage.read_text(STATS_KEY))
+    except Exception:
+        return rebuild_and_save_stats()
+
+
+def _rebuild_stats():
+    """
+    從 CSV 整份重算統計並以條件式寫入存檔；期間統計被其他副本更新過就重新讀取再算。
+    回傳 (重算前存檔的統計（不存在或無法解析時為 None）, 重算結果)。
+    """
+    with _mutation_lock:
+        for attempt in range(WRITE_RETRIES):
+            if attempt:
+                _backoff(attempt)
+
+            # 先取得統計的版本再讀 CSV：讀 CSV 之後才套用的增量會讓寫入失敗而重算
+            data, token = storage.read_versioned(STATS_KEY)
+            try:
+                previous = json.loads(data) if data is not None else None
+            except Exception:
+                previous = None
+
+            stats = rebuild_stats(load_data())
+            if storage.write_if_match(STATS_KEY, json.dumps(stats, ensure_ascii=False).encode("utf-8"), token):
+                return previous, stats
+
+    logger.warning("統計重新計算多次衝突，本次結果未存檔")
+    return previous, stats
+
+
+def rebuild_and_save_stats():
+    """從 CSV 整份重算統計並存檔，回傳重算結果"""
+    return _rebuild_stats()[1]
+
+
+def verify_and_rebuild_stats():
+    """
+    從 CSV 重算統計並存檔，回傳原本的增量統計是否與重算結果一致。
+    比對與存檔在同一次 _mutation_lock 內完成，中間不會插入本程序的其他異動。
+    """
+    previous, rebuilt = _rebuild_stats()
+    return previous == rebuilt
+
+
+def update_stats(removed=(), added=()):
+    """
+    依異動的資料列增減統計；統計檔尚未建立時略過，第一次讀取時會整份重算。
+    以條件式寫入避免其他副本同時更新時互相蓋掉增量。
+    """
+    with _mutation_lock:
+        for attempt in range(WRITE_RETRIES):
+            if attempt:
+                _backoff(attempt)
+
+            data, token = storage.read_versioned(STATS_KEY)
+            if data is None:
+                return
+
+            try:
+                stats = json.loads(data)
+            except Exception:
+                return
+
+            for row in removed or ():
+                apply_item(stats, row, sign=-1)
+            for row in added or ():
+                apply_item(stats, row, sign=1)
+
+            if storage.write_if_match(STATS_KEY, json.dumps(stats, ensure_ascii=False).encode("utf-8"), token):
+                return
+
+    logger.warning("統計更新多次衝突，請在統計儀表板重新計算")
+
+
+def data_version():
+    """
+    以資料檔與設定檔的版本（本機為修改時間與大小，S3 為物件 ETag）組成版本字串。
+    不需讀取 CSV 內容，供 API 產生 ETag。
+    """
+    return "-".join(storage.version(key) for key in (DATA_KEY, CONFIG_KEY))
+
+
+def filter_items(df, status="全部", keyword="", start_date=None, end_date=None):
+    """依狀態、物品名稱關鍵字與拾獲日期區間篩選失物"""
+    if status in ("未領取", "已領回"):
+        df = df[df["狀態"] == status]
+
+    keyword = (keyword or "").strip()
+    if keyword:
+        df = df[df["物品名稱"].astype(str).str.contains(keyword, case=False, na=False, regex=False)]
+
+    if start_date is not None or end_date is not None:
+        found_dates = pd.to_datetime(df["拾獲日期"], errors="coerce")
+        mask = found_dates.notna()
+        if start_date is not None:
+            mask &= found_dates >= pd.to_datetime(start_date)
+        if end_date is not None:
+            mask &= found_dates <= pd.to_datetime(end_date)
+        df = df[mask]
+
+    return df
+
+
+def get_days_left(found_date_str, expiry_days):
+    try:
+        found_date = datetime.strptime(str(found_date_str), "%Y-%m-%d").date()
+        deadline = found_date + timedelta(days=expiry_days)
+        today = datetime.now().date()
+        days_left = (deadline - today).days
+        return days_left, deadline
+    except Exception:
+        return 0, datetime.now().date()
+
+
+def create_backup_zip():
+    """建立結構乾淨的備份 ZIP"""
+    buffer = io.BytesIO()
+
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for key in (DATA_KEY, CONFIG_KEY):
+            if storage.exists(key):
+                zf.writestr(key, storage.read_bytes(key))
+
+        for key in storage.list_keys(IMG_PREFIX):
+            zf.writestr(key, storage.read_bytes(key))
+
+    buffer.seek(0)
+    return buffer
+
+
+def restore_data_from_zip(uploaded_zip):
+    """
+    將備份還原到目前的儲存後端。
+    還原期間持有 _mutation_lock，同一程序內的新增、刪除、領回會等還原完成再進行；
+    但無法阻擋其他副本寫入，多副本部署時請先停到只剩一個副本再還原。
+    """
+    with _mutation_lock:
+        try:
+            with zipfile.ZipFile(uploaded_zip, "r") as zf:
+                file_names = zf.namelist()
+
+                if DATA_KEY not in file_names:
+                    return False, "備份檔中找不到 lost_items.csv"
+
+                for member in file_names:
+                    normalized = os.path.normpath(member)
+                    if normalized.startswith("..") or os.path.isabs(normalized):
+                        return False, f"備份檔含不安全路徑：{member}"
+
+                storage.delete(DATA_KEY)
+                storage.delete(CONFIG_KEY)
+                storage.delete(STATS_KEY)
+                storage.delete_prefix(IMG_PREFIX)
+                storage.delete_prefix(SNAPSHOT_PREFIX)
+
+                for member in file_names:
+                    if member.endswith("/"):
+                        continue
+                    if member in (DATA_KEY, CONFIG_KEY) or member.startswith(IMG_PREFIX):
+                        storage.write_bytes(member, zf.read(member))
+
+                if not storage.exists(CONFIG_KEY):
+                    save_config({"expiry_days": 60})
+
+                export_static_snapshot()
+                return True, "還原成功！"
+
+        except Exception as e:
+            return False, f"還原失敗：{str(e)}"
@@ -0,0 +1,88 @@
+"""
+圖片解碼：限制檔案大小與像素數，並限制同時解碼的數量，讓記憶體用量可預期。
+
+- 解碼前先讀檔頭檢查檔案大小與長寬，超過上限直接拒絕
+- JPEG 以 draft() 在解碼時直接縮小（DCT 縮放），48MP 手機照片不會完整展開；
+  手機常見的 MPO（多張 JPEG 組成，如 Ultra HDR、三星相機）也是 JPEG，同樣適用
+- 其他格式無法邊解碼邊縮小，像素數超過 MAX_FULL_DECODE_PIXELS 即拒絕
+- 所有 session 共用一個 semaphore，同時最多 MAX_CONCURRENT_DECODES 張圖在解碼
+
+此模組由 lost_found_app.py 匯入（不會隨 Streamlit rerun 重新執行），semaphore 為整個程序共用。
+"""
+import os
+import threading
+
+from PIL import Image, ImageOps, JpegImagePlugin
+
+MAX_UPLOAD_BYTES = int(float(os.environ.get("UPLOAD_MAX_MB", "20")) * 1024 * 1024)
+# 長 x 寬上限（JPEG 會在解碼時縮小，因此可以接受較大的原圖）
+MAX_IMAGE_PIXELS = int(os.environ.get("UPLOAD_MAX_PIXELS", str(64_000_000)))
+# 非 JPEG 需要完整解碼，上限較低
+MAX_FULL_DECODE_PIXELS = int(os.environ.get("UPLOAD_MAX_FULL_DECODE_PIXELS", str(16_000_000)))
+MAX_CONCURRENT_DECODES = int(os.environ.get("MAX_CONCURRENT_DECODES", "2"))
+DECODE_MAX_SIZE = (1600, 1600)
+
+# Pillow 內建的解壓縮炸彈防護：超過此值警告、超過兩倍直接丟出 DecompressionBombError
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+_decode_slots = threading.BoundedSemaphore(MAX_CONCURRENT_DECODES)
+
+
+def _source_size(source):
+    """取得檔案大小（Streamlit UploadedFile、路徑或 file-like 物件）"""
+    size = getattr(source, "size", None)
+    if isinstance(size, int):
+        return size
+
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+
+    position = source.tell()
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(position)
+    return size
+
+
+def open_image_bounded(source, max_size=DECODE_MAX_SIZE):
+    """
+    在大小與並行數限制下解碼圖片，回傳已 EXIF 轉正、縮到 max_size 以內的 RGB 圖片。
+    不符合限制時丟出 ValueError（訊息可直接顯示給使用者）。
+    """
+    if _source_size(source) > MAX_UPLOAD_BYTES:
+        raise ValueError(f"檔案過大，請上傳 {MAX_UPLOAD_BYTES // (1024 * 1024)} MB 以內的照片")
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+    with _decode_slots:
+        try:
+            img = Image.open(source)
+        except Image.DecompressionBombError:
+            raise ValueError("照片解析度過高，請縮小後再上傳")
+
+        with img:
+            # 到這裡只讀了檔頭，尚未解碼像素
+            width, height = img.size
+            pixels = width * height
+
+            if pixels > MAX_IMAGE_PIXELS:
+                raise ValueError(f"照片解析度過高（{width}x{height}），請縮小後再上傳")
+
+            # MpoImageFile 繼承 JpegImageFile，第一張（主圖）同樣可用 draft() 縮小解碼
+            is_jpeg = isinstance(img, JpegImagePlugin.JpegImageFile)
+
+            if not is_jpeg and pixels > MAX_FULL_DECODE_PIXELS:
+                raise ValueError(f"照片解析度過高（{width}x{height}），請改用 JPG 或縮小後再上傳")
+
+            # JPEG 解碼時直接縮小；其他格式不支援，直接完整解碼
+            if is_jpeg:
+                img.draft("RGB", max_size)
+            img.thumbnail(max_size)
+
+            img = ImageOps.exif_transpose(img)
+
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+
+            return img
@@ -0,0 +1,119 @@
+"""
+失物統計：依拾獲地點、物品名稱、拾獲週別累計件數與領回數，並記錄領回天數分布。
+
+統計結果是一份小型 dict（存成 stats.json），新增、領回、刪除時以增減方式更新，
+儀表板不需掃描整份 CSV；rebuild_stats() 可從頭重算，用來驗證增量結果。
+"""
+from datetime import datetime
+
+import pandas as pd
+
+
+def empty_stats():
+    return {
+        "total": 0,
+        "claimed": 0,
+        "by_location": {},
+        "by_name": {},
+        "by_week": {},
+        # 領回所需天數 -> 件數，用來計算中位數
+        "claim_days": {}
+    }
+
+
+def _parse_date(value):
+    if pd.isna(value) or not str(value).strip():
+        return None
+    try:
+        return datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def _label(value):
+    """空白或缺值（CSV 讀入的 NaN）一律歸到「未提供」，不會變成 "nan" 類別"""
+    if value is None or pd.isna(value) or not str(value).strip():
+        return "未提供"
+    return str(value)
+
+
+def _week_label(found_date):
+    if found_date is None:
+        return "未知"
+    year, week, _ = found_date.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _bump(counter, key, field, delta):
+    bucket = counter.setdefault(key, {"total": 0, "claimed": 0})
+    bucket[field] += delta
+    if bucket["total"] <= 0 and bucket["claimed"] <= 0:
+        del counter[key]
+
+
+def _bump_count(counter, key, delta):
+    counter[key] = counter.get(key, 0) + delta
+    if counter[key] <= 0:
+        del counter[key]
+
+
+def apply_item(stats, row, sign=1):
+    """將單筆失物（dict）加入（sign=1）或移出（sign=-1）統計"""
+    found_date = _parse_date(row.get("拾獲日期"))
+    is_claimed = row.get("狀態") == "已領回"
+
+    keys = {
+        "by_location": _label(row.get("拾獲地點")),
+        "by_name": _label(row.get("物品名稱")),
+        "by_week": _week_label(found_date)
+    }
+
+    stats["total"] += sign
+    for group, key in keys.items():
+        _bump(stats[group], key, "total", sign)
+
+    if is_claimed:
+        stats["claimed"] += sign
+        for group, key in keys.items():
+            _bump(stats[group], key, "claimed", sign)
+
+        claim_date = _parse_date(row.get("領回日期"))
+        if found_date is not None and claim_date is not None:
+            days = max((claim_date - found_date).days, 0)
+            _bump_count(stats["claim_days"], str(days), sign)
+
+    return stats
+
+
+def rebuild_stats(df):
+    """從完整資料重新計算統計"""
+    stats = empty_stats()
+    for row in df.to_dict("records"):
+        apply_item(stats, row)
+    return stats
+
+
+def claim_rate(stats):
+    if stats["total"] <= 0:
+        return 0.0
+    return stats["claimed"] / stats["total"]
+
+
+def median_claim_days(stats):
+    """由領回天數分布計算中位數；沒有資料時回傳 None"""
+    histogram = sorted((int(days), count) for days, count in stats["claim_days"].items())
+    count_total = sum(count for _, count in histogram)
+    if count_total == 0:
+        return None
+
+    # 找出第 (n-1)//2 與 n//2 個（從 0 起算）所在的天數
+    targets = [(count_total - 1) // 2, count_total // 2]
+    values = []
+    seen = 0
+    for days, count in histogram:
+        while targets and targets[0] < seen + count:
+            values.append(days)
+            targets.pop(0)
+        seen += count
+
+    return sum(values) / 2
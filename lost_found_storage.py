@@ -0,0 +1,352 @@
+"""
+儲存後端：以「key」（例如 lost_items.csv、uploaded_images/xxx.jpg）存取資料。
+
+- LocalStorage：存放在本機目錄（預設，等同原本的 DATA_DIR 行為）
+- S3Storage：存放在 S3 相容的物件儲存（AWS S3、MinIO、Cloudflare R2 等），
+  圖片會透過本機快取讀取，讓多個 app 副本可以共用同一份資料
+
+以環境變數 STORAGE_BACKEND=local|s3 切換，S3 相關設定見 get_storage()。
+
+會被多方修改的檔案（CSV、統計）以 read_versioned() / write_if_match() 做條件式寫入：
+寫回前內容已被別人改過時 write_if_match() 回傳 None，由呼叫端重新讀取後再試，
+多個副本同時寫入也不會互相覆蓋。
+"""
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+
+
+def _normalize_key(key):
+    """key 一律使用 / 分隔，且不可跳出根目錄"""
+    key = str(key).replace("\\", "/").lstrip("/")
+    parts = [part for part in key.split("/") if part not in ("", ".")]
+    if ".." in parts:
+        raise ValueError(f"不安全的路徑：{key}")
+    return "/".join(parts)
+
+
+class Storage:
+    """儲存後端介面"""
+
+    def read_bytes(self, key):
+        """讀取內容；不存在時丟出 FileNotFoundError"""
+        raise NotImplementedError
+
+    def write_bytes(self, key, data):
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        """刪除單一 key；不存在時忽略"""
+        raise NotImplementedError
+
+    def list_keys(self, prefix=""):
+        raise NotImplementedError
+
+    def version(self, key):
+        """回傳代表目前內容版本的短字串（不讀取內容）；不存在時回傳 "0" """
+        raise NotImplementedError
+
+    def read_versioned(self, key):
+        """讀取內容與版本標記，回傳 (內容, 標記)；不存在時回傳 (None, None)"""
+        raise NotImplementedError
+
+    def write_if_match(self, key, data, token):
+        """
+        僅在內容仍是 token 所代表的版本時寫入（token 為 None 表示僅在不存在時建立）。
+        成功回傳寫入後的版本標記（與 read_versioned() 的標記相同格式）；已被其他寫入者修改時回傳 None。
+        """
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """回傳可供 Pillow / st.image 開啟的本機檔案路徑；不存在時回傳 None"""
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix):
+        for key in list(self.list_keys(prefix)):
+            self.delete(key)
+
+    def read_text(self, key, encoding="utf-8"):
+        return self.read_bytes(key).decode(encoding)
+
+    def write_text(self, key, text, encoding="utf-8"):
+        self.write_bytes(key, text.encode(encoding))
+
+
+class LocalStorage(Storage):
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        # 條件式寫入的比對與寫入需在同一把鎖內完成；本機後端只適用單一主機上的單一 app 程序
+        self._write_lock = threading.Lock()
+        os.makedirs(base_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.base_dir, *_normalize_key(key).split("/"))
+
+    def read_bytes(self, key):
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def write_bytes(self, key, data):
+        """先寫暫存檔再替換，避免其他程序讀到寫一半的檔案"""
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # 每次寫入使用不同的暫存檔，同時寫同一個 key 時才不會互相覆蓋
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def exists(self, key):
+        return os.path.isfile(self._path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def delete_prefix(self, prefix):
+        path = self._path(prefix)
+        if prefix.endswith("/") and os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            super().delete_prefix(prefix)
+
+    def list_keys(self, prefix=""):
+        normalized = _normalize_key(prefix)
+        if prefix.endswith("/") and normalized:
+            start_dir = self._path(normalized)
+            normalized += "/"
+        elif "/" in normalized:
+            start_dir = self._path(normalized.rsplit("/", 1)[0])
+        else:
+            start_dir = self.base_dir
+
+        for root, dirs, files in os.walk(start_dir):
+            for file in files:
+                rel_path = os.path.relpath(os.path.join(root, file), self.base_dir)
+                key = rel_path.replace(os.sep, "/")
+                if key.startswith(normalized) and not key.endswith(".tmp"):
+                    yield key
+
+    def version(self, key):
+        try:
+            stat = os.stat(self._path(key))
+            return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        except OSError:
+            return "0"
+
+    def local_path(self, key):
+        path = self._path(key)
+        return path if os.path.isfile(path) else None
+
+    def read_versioned(self, key):
+        # 以內容雜湊作為版本標記（修改時間的精度不足以分辨同一瞬間的兩次寫入）
+        try:
+            data = self.read_bytes(key)
+        except FileNotFoundError:
+            return None, None
+        return data, hashlib.md5(data).hexdigest()
+
+    def write_if_match(self, key, data, token):
+        with self._write_lock:
+            current, current_token = self.read_versioned(key)
+            if current_token != token:
+                return None
+            self.write_bytes(key, data)
+            return hashlib.md5(data).hexdigest()
+
+
+class S3Storage(Storage):
+    """
+    S3 相容物件儲存。可傳入自備的 boto3 client（例如指向本機 MinIO 或 moto 的測試用 client）。
+    local_path() 會把物件下載到 cache_dir 作為唯讀快取；上傳圖片的檔名含時間戳記、內容不會變動，
+    因此快取命中時不再向物件儲存查詢。
+    """
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, cache_dir=None, client=None):
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("使用 S3 儲存需要安裝 boto3（pip install boto3）")
+            client = boto3.client("s3", endpoint_url=endpoint_url or None)
+
+        self.client = client
+        self.bucket = bucket
+        self.prefix = _normalize_key(prefix)
+        if self.prefix:
+            self.prefix += "/"
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "lost_found_cache")
+        self._cache_lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _object_key(self, key):
+        return self.prefix + _normalize_key(key)
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, *_normalize_key(key).split("/"))
+
+    @staticmethod
+    def _error_code(error):
+        response = getattr(error, "response", None) or {}
+        return str(response.get("Error", {}).get("Code", ""))
+
+    @classmethod
+    def _is_not_found(cls, error):
+        return cls._error_code(error) in ("404", "NoSuchKey", "NotFound")
+
+    @classmethod
+    def _is_conflict(cls, error):
+        # 412：條件不成立；409：同一物件有其他條件式寫入正在進行
+        return cls._error_code(error) in ("412", "PreconditionFailed", "409", "ConditionalRequestConflict")
+
+    def _head(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except Exception as e:
+            if self._is_not_found(e):
+                return None
+            raise
+
+    def read_bytes(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        except Exception as e:
+            if self._is_not_found(e):
+                raise FileNotFoundError(key)
+            raise
+        return response["Body"].read()
+
+    def write_bytes(self, key, data):
+        self._put(key, data)
+
+    def _put(self, key, data, **conditions):
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        response = self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._object_key(key),
+            Body=data,
+            ContentType=content_type,
+            **conditions
+        )
+        self._evict(key)
+        return response
+
+    def read_versioned(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        except Exception as e:
+            if self._is_not_found(e):
+                return None, None
+            raise
+        return response["Body"].read(), response["ETag"]
+
+    def write_if_match(self, key, data, token):
+        conditions = {"IfMatch": token} if token else {"IfNoneMatch": "*"}
+        try:
+            response = self._put(key, data, **conditions)
+        except Exception as e:
+            if self._is_conflict(e):
+                return None
+            raise
+        return response["ETag"]
+
+    def exists(self, key):
+        return self._head(key) is not None
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        self._evict(key)
+
+    def delete_prefix(self, prefix):
+        keys = list(self.list_keys(prefix))
+        # delete_objects 一次最多 1000 筆
+        for start in range(0, len(keys), 1000):
+            batch = keys[start:start + 1000]
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": self._object_key(key)} for key in batch]}
+            )
+        for key in keys:
+            self._evict(key)
+
+    def list_keys(self, prefix=""):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(self.prefix):]
+
+    def version(self, key):
+        head = self._head(key)
+        if head is None:
+            return "0"
+        return str(head.get("ETag", "")).strip('"') or "1"
+
+    def local_path(self, key):
+        cache_path = self._cache_path(key)
+        if os.path.isfile(cache_path):
+            return cache_path
+
+        with self._cache_lock:
+            if os.path.isfile(cache_path):
+                return cache_path
+
+            try:
+                data = self.read_bytes(key)
+            except FileNotFoundError:
+                return None
+
+            directory = os.path.dirname(cache_path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+            return cache_path
+
+    def _evict(self, key):
+        try:
+            os.remove(self._cache_path(key))
+        except FileNotFoundError:
+            pass
+
+
+def get_storage():
+    """
+    依環境變數建立儲存後端：
+    STORAGE_BACKEND=local（預設）：使用 DATA_DIR 目錄
+    STORAGE_BACKEND=s3：使用 S3_BUCKET、S3_PREFIX、S3_ENDPOINT_URL、STORAGE_CACHE_DIR，
+    帳密沿用 boto3 的 AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY
+    """
+    backend = os.environ.get("STORAGE_BACKEND", "local").lower()
+
+    if backend == "s3":
+        bucket = os.environ.get("S3_BUCKET")
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 時必須設定 S3_BUCKET")
+        return S3Storage(
+            bucket,
+            prefix=os.environ.get("S3_PREFIX", ""),
+            endpoint_url=os.environ.get("S3_ENDPOINT_URL"),
+            cache_dir=os.environ.get("STORAGE_CACHE_DIR")
+        )
+
+    if backend != "local":
+        raise RuntimeError(f"不支援的 STORAGE_BACKEND：{backend}")
+
+    return LocalStorage(os.environ.get("DATA_DIR", "."))
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# 測試直接匯入專案根目錄的模組
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# lost_found_data 匯入時會建立空白 CSV，先指到暫存目錄，避免寫進專案目錄
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="lost_found_test_"))
@@ -0,0 +1,126 @@
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+from urllib.parse import quote
+
+import pandas as pd
+import pytest
+
+import lost_found_api
+import lost_found_data
+from lost_found_storage import LocalStorage
+
+
+def make_df():
+    return pd.DataFrame([
+        [1, "藍色水壺", "操場", "2025-11-20", "", "uploaded_images/bottle.jpg", "未領取", ""],
+        [2, "外套", "走廊", "2025-12-05", "", "C:\\data\\uploaded_images\\coat.jpg", "已領回", "2025-12-10"],
+        [3, "水壺", "教室", "2025-12-15", "", "", "未領取", ""],
+    ], columns=lost_found_data.DATA_COLUMNS)
+
+
+def item_ids(payload):
+    return [item["id"] for item in payload["items"]]
+
+
+def test_build_item_list_filters_and_sorts():
+    df = make_df()
+
+    assert item_ids(lost_found_api.build_item_list(df, 60, {})) == [3, 2, 1]
+    assert item_ids(lost_found_api.build_item_list(df, 60, {"status": "未領取"})) == [3, 1]
+    assert item_ids(lost_found_api.build_item_list(df, 60, {"q": "水壺"})) == [3, 1]
+    assert item_ids(lost_found_api.build_item_list(df, 60, {"start": "2025-12-01", "end": "2025-12-10"})) == [2]
+
+
+def test_build_item_list_pages():
+    payload = lost_found_api.build_item_list(make_df(), 60, {"page": "2", "per_page": "2"})
+
+    assert payload["total"] == 3
+    assert (payload["page"], payload["per_page"]) == (2, 2)
+    assert item_ids(payload) == [1]
+
+
+def test_thumb_url_uses_file_name():
+    payload = lost_found_api.build_item_list(make_df(), 60, {})
+    thumbs = {item["id"]: item["thumb_url"] for item in payload["items"]}
+
+    # Windows 路徑與快照一樣只取檔名
+    assert thumbs == {1: "/thumbs/bottle.jpg", 2: "/thumbs/coat.jpg", 3: ""}
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path))
+    monkeypatch.setattr(lost_found_data, "storage", storage)
+    monkeypatch.setattr(lost_found_api, "storage", storage)
+    monkeypatch.setattr(lost_found_api, "_cache", {"version": None, "df": None, "expiry_days": 60})
+    storage.write_bytes(lost_found_data.DATA_KEY, lost_found_data._encode_data(make_df()))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), lost_found_api.LostFoundAPIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def get(path, headers=None):
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+        try:
+            conn.request("GET", quote(path, safe="/?=&"), headers=headers or {})
+            response = conn.getresponse()
+            body = response.read()
+            return response.status, response.getheader("ETag"), json.loads(body) if body else None
+        finally:
+            conn.close()
+
+    yield get
+
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.mark.parametrize("query, message", [
+    ("status=遺失", "不支援的狀態"),
+    ("start=2025/12/01", "YYYY-MM-DD"),
+    ("page=0", "page 必須是正整數"),
+    ("per_page=abc", "per_page 必須是正整數"),
+])
+def test_invalid_query_returns_400(api, query, message):
+    status, _, payload = api("/api/items?" + query)
+
+    assert status == 400
+    assert message in payload["error"]
+
+
+def test_etag_returns_304_until_data_changes(api):
+    status, etag, payload = api("/api/items?status=未領取")
+    assert status == 200 and etag
+    assert item_ids(payload) == [3, 1]
+
+    status, same_etag, payload = api("/api/items?status=未領取", {"If-None-Match": etag})
+    assert (status, same_etag, payload) == (304, etag, None)
+
+    # 不同查詢條件使用不同 ETag
+    status, other_etag, _ = api("/api/items")
+    assert status == 200 and other_etag != etag
+
+    version = lost_found_data.data_version()
+    lost_found_data.add_item({
+        "物品名稱": "雨傘",
+        "拾獲地點": "川堂",
+        "拾獲日期": "2025-12-20",
+        "特徵描述": "",
+        "圖片路徑": "",
+        "狀態": "未領取",
+        "領回日期": ""
+    })
+    assert lost_found_data.data_version() != version
+
+    status, new_etag, payload = api("/api/items?status=未領取", {"If-None-Match": etag})
+    assert status == 200 and new_etag != etag
+    assert item_ids(payload) == [4, 3, 1]
+
+
+def test_unknown_path_returns_404(api):
+    status, _, _ = api("/api/unknown")
+
+    assert status == 404
@@ -0,0 +1,169 @@
+import io
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+import lost_found_images
+
+
+class FakeUpload(io.BytesIO):
+    """模擬 Streamlit UploadedFile（有 size 屬性的 file-like 物件）"""
+
+    @property
+    def size(self):
+        return len(self.getvalue())
+
+
+def encode_image(img, fmt, **params):
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, **params)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def phone_jpeg():
+    """8000x6000（48MP）的 JPEG，EXIF 方向為「順時針轉 90 度」"""
+    gradient = Image.linear_gradient("L").resize((8000, 6000))
+    img = Image.merge("RGB", (gradient, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT), gradient))
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    data = encode_image(img, "JPEG", quality=85, exif=exif)
+    assert len(data) <= lost_found_images.MAX_UPLOAD_BYTES
+    return data
+
+
+def test_large_jpeg_is_downsampled_and_transposed(phone_jpeg):
+    img = lost_found_images.open_image_bounded(FakeUpload(phone_jpeg))
+
+    assert img.mode == "RGB"
+    # 原圖為橫向，EXIF 轉正後應為直向，且縮到 DECODE_MAX_SIZE 以內
+    assert img.size == (1200, 1600)
+
+
+def test_parallel_uploads_respect_decode_limit(phone_jpeg, monkeypatch):
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0, "pixels": 0, "peak_pixels": 0}
+    decoded_sizes = []
+    original_open = Image.open
+    original_thumbnail = Image.Image.thumbnail
+
+    # 從開檔到 thumbnail()（實際解碼像素的地方）結束，視為一次進行中的解碼
+    def counting_open(*args, **kwargs):
+        img = original_open(*args, **kwargs)
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.05)
+        return img
+
+    # thumbnail() 會依 self.size 配置並解碼整張影格，進入時的 size 即實際解碼的大小
+    def counting_thumbnail(self, *args, **kwargs):
+        frame_pixels = self.width * self.height
+        with lock:
+            decoded_sizes.append(self.size)
+            state["pixels"] += frame_pixels
+            state["peak_pixels"] = max(state["peak_pixels"], state["pixels"])
+        try:
+            return original_thumbnail(self, *args, **kwargs)
+        finally:
+            with lock:
+                state["active"] -= 1
+                state["pixels"] -= frame_pixels
+
+    monkeypatch.setattr(Image, "open", counting_open)
+    monkeypatch.setattr(Image.Image, "thumbnail", counting_thumbnail)
+
+    results = []
+    errors = []
+
+    def upload():
+        try:
+            results.append(lost_found_images.open_image_bounded(FakeUpload(phone_jpeg)))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=upload) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(results) == 8
+    assert state["peak"] == lost_found_images.MAX_CONCURRENT_DECODES
+    # draft() 讓 8000x6000 的原圖以 1/2 比例解碼，從未展開成完整的 48MP
+    assert decoded_sizes == [(4000, 3000)] * 8
+    # 同時展開的像素量不超過「並行上限 x 單張縮小後的影格」，與上傳人數無關
+    assert state["peak_pixels"] <= lost_found_images.MAX_CONCURRENT_DECODES * 4000 * 3000
+    max_width, max_height = lost_found_images.DECODE_MAX_SIZE
+    for img in results:
+        assert img.width <= max_width and img.height <= max_height
+
+
+def test_mpo_is_decoded_like_jpeg(monkeypatch):
+    # 手機的 MPO（主圖 + 附加影像）不是 "JPEG" 格式，但同樣可以 draft() 縮小解碼
+    main = Image.new("RGB", (6400, 4800), "red")
+    data = encode_image(main, "MPO", save_all=True, append_images=[Image.new("RGB", (640, 480), "blue")])
+    assert Image.open(io.BytesIO(data)).format == "MPO"
+    monkeypatch.setattr(lost_found_images, "MAX_FULL_DECODE_PIXELS", 1_000_000)
+
+    decoded_sizes = []
+    original_thumbnail = Image.Image.thumbnail
+
+    def recording_thumbnail(self, *args, **kwargs):
+        decoded_sizes.append(self.size)
+        return original_thumbnail(self, *args, **kwargs)
+
+    monkeypatch.setattr(Image.Image, "thumbnail", recording_thumbnail)
+
+    img = lost_found_images.open_image_bounded(FakeUpload(data))
+
+    # 以 1/2 比例解碼後再縮到 DECODE_MAX_SIZE；取的是主圖（紅色）而非附加影像
+    assert decoded_sizes == [(3200, 2400)]
+    assert img.size == (1600, 1200)
+    red, _, blue = img.getpixel((0, 0))
+    assert red > 200 and blue < 50
+
+
+def test_oversized_file_is_rejected_before_decoding(monkeypatch):
+    data = encode_image(Image.new("RGB", (200, 200)), "JPEG")
+    monkeypatch.setattr(lost_found_images, "MAX_UPLOAD_BYTES", len(data) - 1)
+    monkeypatch.setattr(Image, "open", lambda *args, **kwargs: pytest.fail("should not open"))
+
+    with pytest.raises(ValueError, match="檔案過大"):
+        lost_found_images.open_image_bounded(FakeUpload(data))
+
+
+def test_too_many_pixels_is_rejected(monkeypatch):
+    data = encode_image(Image.new("RGB", (2000, 1000)), "JPEG")
+    monkeypatch.setattr(lost_found_images, "MAX_IMAGE_PIXELS", 1_000_000)
+
+    with pytest.raises(ValueError, match="解析度過高"):
+        lost_found_images.open_image_bounded(FakeUpload(data))
+
+
+def test_decompression_bomb_is_rejected(monkeypatch):
+    data = encode_image(Image.new("1", (3000, 3000)), "PNG")
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1_000_000)
+
+    with pytest.raises(ValueError, match="解析度過高"):
+        lost_found_images.open_image_bounded(FakeUpload(data))
+
+
+def test_large_non_jpeg_is_rejected(monkeypatch):
+    data = encode_image(Image.new("RGB", (1500, 1000)), "PNG")
+    monkeypatch.setattr(lost_found_images, "MAX_FULL_DECODE_PIXELS", 1_000_000)
+
+    with pytest.raises(ValueError, match="改用 JPG"):
+        lost_found_images.open_image_bounded(FakeUpload(data))
+
+
+def test_small_png_is_accepted_and_converted():
+    data = encode_image(Image.new("RGBA", (300, 200), (255, 0, 0, 128)), "PNG")
+
+    img = lost_found_images.open_image_bounded(FakeUpload(data))
+
+    assert img.mode == "RGB"
+    assert img.size == (300, 200)
@@ -0,0 +1,96 @@
+import io
+import json
+
+import pytest
+from PIL import Image
+
+import lost_found_data
+from lost_found_storage import LocalStorage
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path))
+    monkeypatch.setattr(lost_found_data, "storage", storage)
+    return storage
+
+
+def add_item(storage, name, image_name=""):
+    img_path = ""
+    if image_name:
+        buffer = io.BytesIO()
+        Image.new("RGB", (800, 600), "red").save(buffer, format="JPEG")
+        img_path = lost_found_data.save_image_bytes(image_name, buffer.getvalue())
+
+    return lost_found_data.add_item({
+        "物品名稱": name,
+        "拾獲地點": "操場",
+        "拾獲日期": "2025-12-01",
+        "特徵描述": "",
+        "圖片路徑": img_path,
+        "狀態": "未領取",
+        "領回日期": ""
+    })
+
+
+def read_snapshot(storage):
+    return json.loads(storage.read_text(lost_found_data.SNAPSHOT_PREFIX + "items.json"))
+
+
+def test_snapshot_lists_only_unclaimed_items(storage):
+    add_item(storage, "水壺")
+    claimed_id = add_item(storage, "外套")
+    lost_found_data.update_status(claimed_id)
+
+    snapshot = read_snapshot(storage)
+
+    assert [item["name"] for item in snapshot["items"]] == ["水壺"]
+    assert storage.exists(lost_found_data.SNAPSHOT_PREFIX + "index.html")
+    assert lost_found_data.get_snapshot_error() is None
+
+
+def test_existing_thumbnail_is_not_regenerated(storage, monkeypatch):
+    add_item(storage, "水壺", "bottle.jpg")
+    thumb_key = lost_found_data.SNAPSHOT_THUMB_PREFIX + "bottle.jpg"
+    assert read_snapshot(storage)["items"][0]["thumb"] == "thumbs/bottle.jpg"
+    assert storage.exists(thumb_key)
+
+    monkeypatch.setattr(lost_found_data, "make_thumbnail", lambda *args, **kwargs: pytest.fail("thumbnail regenerated"))
+    add_item(storage, "外套")
+
+    assert [item["thumb"] for item in read_snapshot(storage)["items"]] == ["", "thumbs/bottle.jpg"]
+
+
+def test_deleted_item_thumbnail_is_pruned_and_claimed_kept(storage):
+    deleted_id = add_item(storage, "水壺", "bottle.jpg")
+    claimed_id = add_item(storage, "外套", "coat.jpg")
+    thumb_prefix = lost_found_data.SNAPSHOT_THUMB_PREFIX
+
+    lost_found_data.update_status(claimed_id)
+    lost_found_data.delete_item(deleted_id)
+
+    assert set(storage.list_keys(thumb_prefix)) == {thumb_prefix + "coat.jpg"}
+    assert read_snapshot(storage)["items"] == []
+
+
+def test_stale_export_is_redone_from_latest_data(storage, monkeypatch):
+    add_item(storage, "水壺")
+    original_export = lost_found_data.export_static_snapshot
+    calls = []
+
+    # 模擬另一個副本在本次快照輸出期間寫入新資料（且它的快照已先輸出完成）
+    def racing_export(df=None):
+        result = original_export(df)
+        if not calls:
+            data, token = storage.read_versioned(lost_found_data.DATA_KEY)
+            df = lost_found_data._parse_data(data)
+            df.loc[len(df)] = [99, "雨傘", "走廊", "2025-12-02", "", "", "未領取", ""]
+            storage.write_if_match(lost_found_data.DATA_KEY, lost_found_data._encode_data(df), token)
+        calls.append(df)
+        return result
+
+    monkeypatch.setattr(lost_found_data, "export_static_snapshot", racing_export)
+    add_item(storage, "外套")
+
+    assert len(calls) == 2
+    assert sorted(item["name"] for item in read_snapshot(storage)["items"]) == ["外套", "水壺", "雨傘"]
@@ -0,0 +1,107 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import lost_found_data
+from lost_found_storage import LocalStorage
+from lost_found_stats import apply_item, claim_rate, empty_stats, median_claim_days, rebuild_stats
+
+
+def make_row(item_id, name="水壺", location="操場", found="2025-12-01", status="未領取", claimed=""):
+    return {
+        "ID": item_id,
+        "物品名稱": name,
+        "拾獲地點": location,
+        "拾獲日期": found,
+        "特徵描述": "",
+        "圖片路徑": "",
+        "狀態": status,
+        "領回日期": claimed
+    }
+
+
+def test_incremental_updates_match_rebuild():
+    rows = [make_row(1), make_row(2, name="外套", location="新興館", found="2025-12-10")]
+    stats = empty_stats()
+    for row in rows:
+        apply_item(stats, row)
+
+    # 領回第 1 件：先移出舊資料列再加入新資料列
+    claimed = make_row(1, status="已領回", claimed="2025-12-04")
+    apply_item(stats, rows[0], sign=-1)
+    apply_item(stats, claimed)
+
+    # 刪除第 2 件
+    apply_item(stats, rows[1], sign=-1)
+
+    assert stats == rebuild_stats(pd.DataFrame([claimed]))
+    assert stats["by_location"] == {"操場": {"total": 1, "claimed": 1}}
+    assert stats["by_week"] == {"2025-W49": {"total": 1, "claimed": 1}}
+    assert claim_rate(stats) == 1.0
+
+
+def test_median_claim_days_from_histogram():
+    assert median_claim_days(empty_stats()) is None
+    assert median_claim_days({"claim_days": {"5": 1}}) == 5
+    assert median_claim_days({"claim_days": {"1": 1, "3": 1, "10": 2}}) == 6.5
+    assert median_claim_days({"claim_days": {"2": 3, "9": 1}}) == 2
+
+
+def test_claimed_row_without_claim_date_is_counted_but_not_in_median():
+    stats = rebuild_stats(pd.DataFrame([make_row(1, status="已領回")]))
+    assert stats["claimed"] == 1
+    assert stats["claim_days"] == {}
+
+
+def test_missing_location_and_name_fall_back_to_placeholder():
+    # CSV 讀入的空欄位是 NaN，不能變成 "nan" 類別
+    rows = [make_row(1, name=np.nan, location=np.nan), make_row(2, name="  ", location="")]
+    stats = rebuild_stats(pd.DataFrame(rows))
+
+    assert stats["by_location"] == {"未提供": {"total": 2, "claimed": 0}}
+    assert stats["by_name"] == {"未提供": {"total": 2, "claimed": 0}}
+
+    for row in rows:
+        apply_item(stats, row, sign=-1)
+    assert stats == empty_stats()
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path))
+    monkeypatch.setattr(lost_found_data, "storage", storage)
+    monkeypatch.setattr(lost_found_data, "export_static_snapshot", lambda df=None: (True, None))
+    storage.write_bytes(lost_found_data.DATA_KEY, lost_found_data._encode_data(pd.DataFrame([make_row(1)])))
+    return storage
+
+
+def test_verify_and_rebuild_stats_detects_and_repairs_drift(storage):
+    lost_found_data.load_stats()
+    lost_found_data.add_item({key: value for key, value in make_row(0, name="外套").items() if key != "ID"})
+    assert lost_found_data.verify_and_rebuild_stats()
+
+    storage.write_text(lost_found_data.STATS_KEY, json.dumps(empty_stats()))
+    assert not lost_found_data.verify_and_rebuild_stats()
+    assert lost_found_data.load_stats()["total"] == 2
+
+
+def test_rebuild_retries_when_stats_change_concurrently(storage, monkeypatch):
+    lost_found_data.load_stats()
+    original_load_data = lost_found_data.load_data
+    calls = []
+
+    # 模擬另一個副本在重算期間更新了統計：第一次寫入應失敗並重新計算
+    def racing_load_data():
+        if not calls:
+            storage.write_text(lost_found_data.STATS_KEY, json.dumps(empty_stats()))
+        calls.append(1)
+        return original_load_data()
+
+    monkeypatch.setattr(lost_found_data, "load_data", racing_load_data)
+    stats = lost_found_data.rebuild_and_save_stats()
+
+    assert len(calls) == 2
+    assert stats["total"] == 1
+    assert json.loads(storage.read_text(lost_found_data.STATS_KEY)) == stats
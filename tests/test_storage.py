@@ -0,0 +1,136 @@
+import os
+
+import pytest
+
+from lost_found_storage import LocalStorage, S3Storage
+
+BUCKET = "lost-found-test"
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    # 只有 S3 測試需要 moto / boto3，未安裝時不影響本機後端的測試
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def s3_storage(s3_client, tmp_path):
+    return S3Storage(BUCKET, prefix="school", cache_dir=str(tmp_path / "cache"), client=s3_client)
+
+
+@pytest.fixture(params=["local", "s3"])
+def storage(request, tmp_path):
+    if request.param == "local":
+        return LocalStorage(str(tmp_path / "data"))
+    return request.getfixturevalue("s3_storage")
+
+
+def test_read_write_exists_delete(storage):
+    assert not storage.exists("lost_items.csv")
+    with pytest.raises(FileNotFoundError):
+        storage.read_bytes("lost_items.csv")
+
+    storage.write_text("lost_items.csv", "ID,物品名稱\n1,水壺\n")
+    assert storage.exists("lost_items.csv")
+    assert storage.read_text("lost_items.csv") == "ID,物品名稱\n1,水壺\n"
+
+    storage.delete("lost_items.csv")
+    storage.delete("lost_items.csv")
+    assert not storage.exists("lost_items.csv")
+
+
+def test_list_keys_and_delete_prefix(storage):
+    storage.write_bytes("lost_items.csv", b"csv")
+    storage.write_bytes("uploaded_images/a.jpg", b"a")
+    storage.write_bytes("uploaded_images/b.jpg", b"b")
+    storage.write_bytes("snapshot/thumbs/a.jpg", b"ta")
+
+    assert sorted(storage.list_keys("uploaded_images/")) == ["uploaded_images/a.jpg", "uploaded_images/b.jpg"]
+    assert "lost_items.csv" in set(storage.list_keys())
+
+    storage.delete_prefix("uploaded_images/")
+    assert list(storage.list_keys("uploaded_images/")) == []
+    assert storage.exists("snapshot/thumbs/a.jpg")
+    assert storage.exists("lost_items.csv")
+
+
+def test_version_changes_on_write(storage):
+    assert storage.version("config.json") == "0"
+    storage.write_text("config.json", '{"expiry_days": 60}')
+    first = storage.version("config.json")
+    storage.write_text("config.json", '{"expiry_days": 30, "x": 1}')
+    assert storage.version("config.json") not in ("0", first)
+
+
+def test_write_if_match_rejects_stale_token(storage):
+    assert storage.read_versioned("stats.json") == (None, None)
+    assert storage.write_if_match("stats.json", b"1", None)
+    # 不存在時才建立：已存在就失敗
+    assert not storage.write_if_match("stats.json", b"x", None)
+
+    data, token = storage.read_versioned("stats.json")
+    assert data == b"1"
+    new_token = storage.write_if_match("stats.json", b"2", token)
+    # 回傳的版本標記即為寫入後讀到的標記
+    assert new_token and storage.read_versioned("stats.json") == (b"2", new_token)
+    # 同一個舊版本標記再寫一次，表示期間已被別人改過
+    assert not storage.write_if_match("stats.json", b"3", token)
+    assert storage.read_bytes("stats.json") == b"2"
+
+
+def test_unsafe_key_is_rejected(storage):
+    with pytest.raises(ValueError):
+        storage.write_bytes("../escape.txt", b"x")
+
+
+def test_local_path_missing_returns_none(storage):
+    assert storage.local_path("uploaded_images/missing.jpg") is None
+
+
+def test_s3_objects_are_stored_under_prefix(s3_storage, s3_client):
+    s3_storage.write_bytes("uploaded_images/a.jpg", b"a")
+    keys = [obj["Key"] for obj in s3_client.list_objects_v2(Bucket=BUCKET)["Contents"]]
+    assert keys == ["school/uploaded_images/a.jpg"]
+
+
+def test_s3_local_path_is_read_through_cache(s3_storage, s3_client, monkeypatch):
+    s3_storage.write_bytes("uploaded_images/a.jpg", b"original")
+
+    downloads = []
+    original_get = s3_client.get_object
+
+    def counting_get(**kwargs):
+        downloads.append(kwargs["Key"])
+        return original_get(**kwargs)
+
+    monkeypatch.setattr(s3_client, "get_object", counting_get)
+
+    path = s3_storage.local_path("uploaded_images/a.jpg")
+    assert open(path, "rb").read() == b"original"
+    assert s3_storage.local_path("uploaded_images/a.jpg") == path
+    assert len(downloads) == 1
+
+
+def test_s3_cache_is_evicted_on_write_delete_and_delete_prefix(s3_storage):
+    s3_storage.write_bytes("uploaded_images/a.jpg", b"v1")
+    s3_storage.write_bytes("uploaded_images/b.jpg", b"b")
+    s3_storage.local_path("uploaded_images/a.jpg")
+
+    s3_storage.write_bytes("uploaded_images/a.jpg", b"v2")
+    assert open(s3_storage.local_path("uploaded_images/a.jpg"), "rb").read() == b"v2"
+
+    s3_storage.delete("uploaded_images/a.jpg")
+    assert s3_storage.local_path("uploaded_images/a.jpg") is None
+
+    cached_b = s3_storage.local_path("uploaded_images/b.jpg")
+    s3_storage.delete_prefix("uploaded_images/")
+    assert not os.path.exists(cached_b)
+    assert s3_storage.local_path("uploaded_images/b.jpg") is None